@@ -2,6 +2,8 @@ import os
 from datetime import datetime
 from flask_cors import CORS  
 import gc
+import io
+import hmac
 
 # Crear carpeta para uploads si no existe
 os.makedirs('temp_uploads', exist_ok=True)
@@ -15,6 +17,8 @@ load_dotenv()
 from database.conexion import init_db, test_connection, close_all_connections
 from database.usuario import sp_loguearse, sp_registrar_usuario, sp_aceptar_condiciones
 from database.historial import sp_guardar_historial, sp_obtener_historial_usuario
+from database.importacion import importar_usuarios, verificar_tabla_usuarios, FORMATOS, TAMANO_LOTE, MAX_TAMANO_LOTE
+from modelo.cargador import precargar_modelo, estado_modelo
 
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +29,8 @@ CORS(app, supports_credentials=True)
 
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'tu-clave-secreta-aqui')
 app.config['UPLOAD_FOLDER'] = 'temp_uploads'
+app.config['ADMIN_TOKEN'] = os.getenv('ADMIN_TOKEN', '').strip()
+app.config['IMPORTACION_MAX_BYTES'] = int(os.getenv('IMPORTACION_MAX_MB', 50)) * 1024 * 1024
 
 # ✅ INICIALIZACIÓN ÚNICA de base de datos
 print("🚀 Inicializando aplicación...")
@@ -35,6 +41,12 @@ try:
 except Exception as e:
     print(f"❌ Error inicializando BD: {e}")
 
+# Verificar la tabla usada por la importación masiva de usuarios
+try:
+    verificar_tabla_usuarios()
+except Exception as e:
+    print(f"❌ Importación masiva no disponible: {e}")
+
 # Headers CORS manuales
 @app.after_request
 def after_request(response):
@@ -55,13 +67,15 @@ def health_check():
     """Endpoint de salud de la API"""
     db_status = "connected" if test_connection() else "disconnected"
     
-    ia_status = "not_loaded"  # Siempre "not_loaded" porque se carga bajo demanda
+    ia_info = estado_modelo()
     
     return jsonify({
         "status": "OK", 
         "message": "API funcionando",
         "database": db_status,
-        "ai_model": ia_status,
+        "ai_model": ia_info["status"],
+        "ai_variant": ia_info.get("modo"),
+        "ai_model_info": ia_info,
         "service": "Prostate AI Backend"
     })
 
@@ -196,6 +210,92 @@ def register():
             "error": str(e)
         }), 400
 
+@app.route('/api/usuarios/importar', methods=['POST', 'OPTIONS'])
+def importar_usuarios_masivo():
+    """Endpoint para registro masivo de usuarios desde CSV o NDJSON"""
+    if request.method == 'OPTIONS':
+        return jsonify({"status": "OK"}), 200
+    
+    # Operación solo para administradores: requiere ADMIN_TOKEN configurado
+    token_admin = app.config['ADMIN_TOKEN']
+    if not token_admin:
+        return jsonify({
+            "success": False,
+            "error": "Importación masiva deshabilitada: configure ADMIN_TOKEN"
+        }), 403
+    
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(token.encode(), token_admin.encode()):
+        return jsonify({
+            "success": False,
+            "error": "Token de administrador inválido"
+        }), 401
+    
+    # Limitar el tamaño del archivo recibido
+    if request.content_length is None:
+        return jsonify({
+            "success": False,
+            "error": "Se requiere el encabezado Content-Length"
+        }), 411
+    
+    if request.content_length > app.config['IMPORTACION_MAX_BYTES']:
+        return jsonify({
+            "success": False,
+            "error": f"El archivo supera el máximo de {app.config['IMPORTACION_MAX_BYTES'] // (1024 * 1024)} MB"
+        }), 413
+        
+    try:
+        # Formato por parámetro o deducido del Content-Type
+        formato = request.args.get('formato')
+        if not formato:
+            formato = 'ndjson' if 'ndjson' in (request.mimetype or '') else 'csv'
+        
+        if formato not in FORMATOS:
+            return jsonify({
+                "success": False,
+                "error": f"Formato no soportado. Use {' o '.join(FORMATOS)}"
+            }), 400
+        
+        try:
+            tamano_lote = int(request.args.get('lote', TAMANO_LOTE))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "El tamaño de lote debe ser un número entero"
+            }), 400
+        
+        if not 1 <= tamano_lote <= MAX_TAMANO_LOTE:
+            return jsonify({
+                "success": False,
+                "error": f"El tamaño de lote debe estar entre 1 y {MAX_TAMANO_LOTE}"
+            }), 400
+        
+        # Leer el cuerpo en streaming, sin cargarlo completo en memoria; se decodifica por línea
+        entrada = io.BufferedReader(request.stream)
+        reporte = importar_usuarios(entrada, formato, tamano_lote)
+        
+        mensaje = f"Se registraron {reporte['registrados']} de {reporte['total']} usuarios"
+        if reporte["interrumpido"]:
+            mensaje += f". Importación interrumpida en la fila {reporte['interrumpido']['fila']}"
+        
+        return jsonify({
+            "success": reporte["fallidos"] == 0 and not reporte["interrumpido"],
+            "message": mensaje,
+            "data": reporte
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    except Exception as e:
+        print(f"❌ Error en importar_usuarios_masivo: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/accept-terms', methods=['POST', 'OPTIONS'])
 def accept_terms():
     """Endpoint para aceptar términos y condiciones"""
@@ -383,7 +483,9 @@ if __name__ == '__main__':
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
     print("🚀 Iniciando servidor sin cargar modelo de IA...")
-    print("📝 Modelo de IA: Se cargará bajo demanda cuando se use /api/analizar")
+    print("📝 Modelo de IA: Se cargará bajo demanda cuando se use /api/analizar (o al iniciar con MODELO_PRECARGAR=true)")
+    # Con gunicorn la precarga se hace en cada worker desde gunicorn.conf.py
+    precargar_modelo()
     
     #app.run(host='0.0.0.0', port=port, debug=debug)
     app.run(host='192.168.100.23', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,469 @@
+import csv
+import io
+import json
+import os
+import psycopg2
+from psycopg2 import sql
+from database.conexion import get_connection, return_connection
+
+# Tabla donde sp_registrar_usuario guarda las cuentas (para detectar correos ya registrados)
+TABLA_USUARIOS = os.getenv('DB_TABLA_USUARIOS', 'usuarios').strip()
+
+TAMANO_LOTE = 1000
+# Límite de filas por lote: el lote, el buffer de COPY y los resultados viven en memoria
+MAX_TAMANO_LOTE = 10000
+FORMATOS = ('csv', 'ndjson')
+
+# Máximo de errores detallados en el reporte; el resto solo se cuenta
+MAX_ERRORES_DETALLE = int(os.getenv('IMPORTACION_MAX_ERRORES', 1000))
+
+# Tabla temporal por conexión; se vacía sola al confirmar o revertir cada lote
+SQL_CREAR_STAGING = """
+    CREATE TEMP TABLE IF NOT EXISTS staging_usuarios (
+        fila integer PRIMARY KEY,
+        nombre text,
+        correo text,
+        password text,
+        error text
+    ) ON COMMIT DELETE ROWS
+"""
+
+SQL_COPY_STAGING = (
+    "COPY staging_usuarios (fila, nombre, correo, password) FROM STDIN WITH (FORMAT csv)"
+)
+
+# Mismas reglas que /api/register, aplicadas a todo el lote de una vez
+SQL_VALIDAR_CAMPOS = """
+    UPDATE staging_usuarios SET error = CASE
+        WHEN coalesce(nombre, '') = '' OR coalesce(correo, '') = '' OR coalesce(password, '') = ''
+            THEN 'Nombre, correo y password son requeridos'
+        WHEN char_length(password) < 6
+            THEN 'La contraseña debe tener al menos 6 caracteres'
+    END
+"""
+
+SQL_VALIDAR_DUPLICADOS = """
+    UPDATE staging_usuarios s SET error = 'Correo duplicado en el archivo'
+    FROM (
+        SELECT fila, row_number() OVER (PARTITION BY correo ORDER BY fila) AS orden
+        FROM staging_usuarios
+        WHERE error IS NULL
+    ) d
+    WHERE s.fila = d.fila AND d.orden > 1
+"""
+
+SQL_VALIDAR_EXISTENTES = sql.SQL("""
+    UPDATE staging_usuarios s SET error = 'El correo ya está registrado'
+    WHERE s.error IS NULL
+      AND EXISTS (SELECT 1 FROM {tabla} u WHERE u.correo = s.correo)
+""")
+
+SQL_OBTENER_ERRORES = """
+    SELECT fila, correo, error FROM staging_usuarios
+    WHERE error IS NOT NULL
+    ORDER BY fila
+"""
+
+SQL_REGISTRAR_VALIDOS = """
+    SELECT fila, correo, sp_registrar_usuario(nombre, correo, password)
+    FROM staging_usuarios
+    WHERE error IS NULL
+    ORDER BY fila
+"""
+
+SQL_OBTENER_VALIDOS = """
+    SELECT fila, nombre, correo, password
+    FROM staging_usuarios
+    WHERE error IS NULL
+    ORDER BY fila
+"""
+
+SQL_EXISTE_TABLA_USUARIOS = """
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = ANY(current_schemas(false))
+      AND table_name = %s
+      AND column_name = 'correo'
+"""
+
+ERROR_NO_TEXTO = "Nombre, correo y password deben ser texto"
+ERROR_CODIFICACION = "La fila no es texto UTF-8 válido"
+ERROR_NUL = "Los campos no pueden contener el carácter NUL"
+
+
+def verificar_tabla_usuarios(connection=None):
+    """
+    Verificar que la tabla de usuarios configurada existe y tiene la columna correo
+
+    Raises:
+        Exception: Si la tabla no existe, con el nombre configurado en DB_TABLA_USUARIOS
+    """
+    propia = connection is None
+    if propia:
+        connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_EXISTE_TABLA_USUARIOS, [TABLA_USUARIOS])
+            existe = cursor.fetchone() is not None
+        connection.rollback()
+    finally:
+        if propia:
+            return_connection(connection)
+
+    if not existe:
+        raise Exception(
+            f"La tabla de usuarios '{TABLA_USUARIOS}' (con columna 'correo') no existe. "
+            f"Configure DB_TABLA_USUARIOS con el nombre de la tabla usada por sp_registrar_usuario"
+        )
+
+
+class _LineasUTF8:
+    """
+    Iterador de líneas de un stream binario, decodificadas en UTF-8 una a una
+
+    Decodificar por línea (y no con TextIOWrapper, que lee por adelantado) permite
+    asociar un byte inválido a su fila. Las líneas con bytes inválidos o con NUL se
+    entregan saneadas y el problema queda en `error` hasta que el lector lo consume.
+    """
+
+    def __init__(self, stream):
+        self._lineas = iter(stream)
+        self._primera = True
+        self.error = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        linea = next(self._lineas)
+        codificacion = 'utf-8-sig' if self._primera else 'utf-8'
+        self._primera = False
+        try:
+            texto = linea.decode(codificacion)
+        except UnicodeDecodeError:
+            texto = linea.decode(codificacion, errors='replace')
+            self.error = self.error or ERROR_CODIFICACION
+        if '\x00' in texto:
+            # PostgreSQL no admite NUL en text: se rechaza la fila, no el lote
+            texto = texto.replace('\x00', '')
+            self.error = self.error or ERROR_NUL
+        return texto
+
+    def consumir_error(self):
+        error, self.error = self.error, None
+        return error
+
+
+def _filas_csv(lector, lineas):
+    for fila, registro in enumerate(lector, start=1):
+        yield (fila, registro.get('nombre'), registro.get('correo'), registro.get('password'),
+               lineas.consumir_error())
+
+
+def _filas_ndjson(lineas):
+    fila = 0
+    for linea in lineas:
+        if not linea.strip():
+            lineas.consumir_error()
+            continue
+        fila += 1
+        error = lineas.consumir_error()
+        if error:
+            yield (fila, None, None, None, error)
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            yield (fila, None, None, None, f"JSON inválido: {e}")
+            continue
+        if not isinstance(registro, dict):
+            yield (fila, None, None, None, "Cada línea debe ser un objeto JSON")
+            continue
+        nombre = registro.get('nombre')
+        correo = registro.get('correo')
+        password = registro.get('password')
+        # Igual que /api/register: solo se aceptan textos, sin convertir otros tipos
+        if any(valor is not None and not isinstance(valor, str) for valor in (nombre, correo, password)):
+            yield (fila, None, correo if isinstance(correo, str) else None, None, ERROR_NO_TEXTO)
+            continue
+        # "\u0000" es JSON válido pero PostgreSQL lo rechaza
+        if any(valor and '\x00' in valor for valor in (nombre, correo, password)):
+            yield (fila, None, None, None, ERROR_NUL)
+            continue
+        yield (fila, nombre, correo, password, None)
+
+
+def leer_filas(stream, formato):
+    """
+    Preparar la lectura de las filas del archivo, una a una, sin cargarlo completo en memoria
+
+    La cabecera CSV se valida de inmediato; las filas se leen al iterar. Las filas
+    que no son UTF-8 válido o contienen NUL se entregan como errores de fila.
+
+    Args:
+        stream: Archivo binario abierto (CSV UTF-8 con cabecera o NDJSON)
+        formato (str): 'csv' o 'ndjson'
+
+    Returns:
+        iterator: Tuplas (fila, nombre, correo, password, error) donde error indica
+        un problema de lectura de la fila o None si se pudo interpretar
+    """
+    lineas = _LineasUTF8(stream)
+    if formato == 'csv':
+        lector = csv.DictReader(lineas)
+        campos = lector.fieldnames
+        error = lineas.consumir_error()
+        if error:
+            raise ValueError(f"Cabecera CSV inválida: {error}")
+        faltantes = {'nombre', 'correo', 'password'} - set(campos or [])
+        if faltantes:
+            raise ValueError(f"Faltan columnas en la cabecera CSV: {', '.join(sorted(faltantes))}")
+        return _filas_csv(lector, lineas)
+    if formato == 'ndjson':
+        return _filas_ndjson(lineas)
+    raise ValueError(f"Formato no soportado: {formato}. Use {' o '.join(FORMATOS)}")
+
+
+def _registrar_fila_por_fila(cursor, errores):
+    """
+    Registrar las filas válidas del staging una a una, cada una en su SAVEPOINT
+
+    Los errores de PostgreSQL se agregan a errores; retorna los resultados exitosos
+    """
+    cursor.execute(SQL_OBTENER_VALIDOS)
+    validos = cursor.fetchall()
+
+    resultados = []
+    for fila, nombre, correo, password in validos:
+        cursor.execute("SAVEPOINT registro_fila")
+        try:
+            cursor.execute("SELECT sp_registrar_usuario(%s, %s, %s)", [nombre, correo, password])
+            resultados.append((fila, correo, cursor.fetchone()[0]))
+            cursor.execute("RELEASE SAVEPOINT registro_fila")
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT registro_fila")
+            errores.append({"fila": fila, "correo": correo, "error": f"Error registrando usuario: {e}"})
+    return resultados
+
+
+def _procesar_lote(connection, lote):
+    """
+    Carga un lote en staging con COPY, lo valida en SQL y registra las filas válidas
+    en una sola transacción
+
+    Returns:
+        tuple: (registrados, errores)
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for fila, nombre, correo, password in lote:
+        escritor.writerow([fila, nombre, correo, password])
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_CREAR_STAGING)
+        cursor.copy_expert(SQL_COPY_STAGING, buffer)
+
+        cursor.execute(SQL_VALIDAR_CAMPOS)
+        cursor.execute(SQL_VALIDAR_DUPLICADOS)
+        cursor.execute(SQL_VALIDAR_EXISTENTES.format(tabla=sql.Identifier(TABLA_USUARIOS)))
+
+        cursor.execute(SQL_OBTENER_ERRORES)
+        errores = [
+            {"fila": fila, "correo": correo, "error": error}
+            for fila, correo, error in cursor.fetchall()
+        ]
+
+        # Registro en bloque; si alguna fila falla, se reintenta fila por fila
+        # para reportar solo las filas problemáticas
+        cursor.execute("SAVEPOINT registro_lote")
+        try:
+            cursor.execute(SQL_REGISTRAR_VALIDOS)
+            resultados = cursor.fetchall()
+            cursor.execute("RELEASE SAVEPOINT registro_lote")
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT registro_lote")
+            print(f"⚠️  Registro en bloque falló ({e}), reintentando fila por fila")
+            resultados = _registrar_fila_por_fila(cursor, errores)
+
+        registrados = 0
+        for fila, correo, resultado in resultados:
+            if resultado == 1:
+                registrados += 1
+            else:
+                errores.append({
+                    "fila": fila,
+                    "correo": correo,
+                    "error": "Error desconocido al registrar usuario"
+                })
+
+    connection.commit()
+    errores.sort(key=lambda e: e["fila"])
+    return registrados, errores
+
+
+def _procesar_lote_aislando(connection, lote):
+    """
+    Procesar un lote; si PostgreSQL rechaza los datos (no la conexión), se divide
+    en mitades hasta aislar las filas problemáticas y el resto se registra igual
+
+    Returns:
+        tuple: (registrados, errores)
+    """
+    try:
+        return _procesar_lote(connection, lote)
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        connection.rollback()
+        if len(lote) == 1:
+            fila, _, correo, _ = lote[0]
+            return 0, [{"fila": fila, "correo": correo, "error": f"Error de base de datos: {e}"}]
+        mitad = len(lote) // 2
+        registrados_1, errores_1 = _procesar_lote_aislando(connection, lote[:mitad])
+        registrados_2, errores_2 = _procesar_lote_aislando(connection, lote[mitad:])
+        return registrados_1 + registrados_2, errores_1 + errores_2
+
+
+def importar_usuarios(stream, formato, tamano_lote=TAMANO_LOTE):
+    """
+    Registra usuarios de forma masiva a partir de un archivo CSV o NDJSON
+
+    Las filas se leen en streaming y se procesan por lotes: cada lote se copia a
+    una tabla temporal con COPY FROM STDIN, se valida con las mismas reglas que
+    /api/register y se confirma en su propia transacción. Las filas que
+    sp_registrar_usuario rechaza se reportan sin descartar el resto del lote.
+
+    Las filas con datos inválidos (UTF-8 incorrecto, NUL) se reportan como errores
+    de fila; solo un fallo de infraestructura (conexión, etc.) descarta un lote
+    completo. Si la lectura del archivo falla a mitad de camino (CSV malformado,
+    cliente desconectado), se confirman las filas ya leídas y se retorna el
+    reporte parcial indicando la fila donde se interrumpió.
+
+    Args:
+        stream: Archivo binario abierto
+        formato (str): 'csv' o 'ndjson'
+        tamano_lote (int): Filas por transacción, entre 1 y MAX_TAMANO_LOTE
+
+    Returns:
+        dict: Totales de la importación y errores por fila (hasta MAX_ERRORES_DETALLE)
+    """
+    if not 1 <= tamano_lote <= MAX_TAMANO_LOTE:
+        raise ValueError(f"El tamaño de lote debe estar entre 1 y {MAX_TAMANO_LOTE}")
+
+    reporte = {
+        "total": 0,
+        "registrados": 0,
+        "fallidos": 0,
+        "lotes": 0,
+        "errores": [],
+        "errores_omitidos": 0,
+        "interrumpido": None
+    }
+
+    def registrar_errores(errores):
+        reporte["fallidos"] += len(errores)
+        espacio = max(0, MAX_ERRORES_DETALLE - len(reporte["errores"]))
+        reporte["errores"].extend(errores[:espacio])
+        reporte["errores_omitidos"] += max(0, len(errores) - espacio)
+
+    def procesar(lote):
+        if not lote:
+            return
+        reporte["lotes"] += 1
+        try:
+            registrados, errores = _procesar_lote_aislando(connection, lote)
+        except psycopg2.Error as e:
+            # Fallo de infraestructura: el lote completo queda sin registrar
+            connection.rollback()
+            print(f"❌ Error de PostgreSQL en lote {reporte['lotes']}: {e}")
+            registrados = 0
+            errores = [
+                {"fila": fila, "correo": correo, "error": f"Error de base de datos: {e}"}
+                for fila, _, correo, _ in lote
+            ]
+        reporte["registrados"] += registrados
+        registrar_errores(errores)
+        print(f"📦 Lote {reporte['lotes']}: {registrados} registrados, {len(errores)} fallidos")
+
+    print(f"📥 Iniciando importación masiva de usuarios ({formato}, lotes de {tamano_lote})")
+
+    connection = get_connection()
+    try:
+        verificar_tabla_usuarios(connection)
+        filas = leer_filas(stream, formato)
+
+        lote = []
+        ultima_fila = 0
+        while True:
+            try:
+                registro = next(filas, None)
+            except Exception as e:
+                # CSV malformado, cliente desconectado...
+                reporte["interrumpido"] = {
+                    "fila": ultima_fila + 1,
+                    "error": f"Error leyendo el archivo: {e}"
+                }
+                print(f"❌ Lectura interrumpida en fila {ultima_fila + 1}: {e}")
+                break
+            if registro is None:
+                break
+
+            fila, nombre, correo, password, error = registro
+            ultima_fila = fila
+            reporte["total"] += 1
+            if error:
+                registrar_errores([{"fila": fila, "correo": correo, "error": error}])
+                continue
+            lote.append((fila, nombre, correo, password))
+            if len(lote) >= tamano_lote:
+                procesar(lote)
+                lote = []
+        procesar(lote)
+    except Exception as e:
+        connection.rollback()
+        print(f"❌ Error en importación masiva: {e}")
+        raise e
+    finally:
+        return_connection(connection)
+
+    print(f"✅ Importación terminada: {reporte['registrados']} de {reporte['total']} usuarios registrados")
+    return reporte
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from database.conexion import init_db, close_all_connections
+
+    parser = argparse.ArgumentParser(description="Importación masiva de usuarios desde CSV o NDJSON")
+    parser.add_argument('archivo', help="Ruta del archivo, o '-' para leer de la entrada estándar")
+    parser.add_argument('--formato', choices=FORMATOS,
+                        help="Formato del archivo (por defecto se deduce de la extensión)")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                        help=f"Filas por transacción (máximo {MAX_TAMANO_LOTE})")
+    args = parser.parse_args()
+    if not 1 <= args.lote <= MAX_TAMANO_LOTE:
+        parser.error(f"--lote debe estar entre 1 y {MAX_TAMANO_LOTE}")
+
+    formato = args.formato
+    if not formato:
+        formato = 'ndjson' if args.archivo.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    init_db(None)
+    try:
+        verificar_tabla_usuarios()
+        if args.archivo == '-':
+            reporte = importar_usuarios(sys.stdin.buffer, formato, args.lote)
+        else:
+            with open(args.archivo, 'rb') as entrada:
+                reporte = importar_usuarios(entrada, formato, args.lote)
+    finally:
+        close_all_connections()
+
+    for error in reporte["errores"]:
+        print(f"   ⚠️  Fila {error['fila']} ({error['correo']}): {error['error']}")
+    if reporte["errores_omitidos"]:
+        print(f"   ⚠️  ... y {reporte['errores_omitidos']} errores más sin detalle")
+    if reporte["interrumpido"]:
+        interrumpido = reporte["interrumpido"]
+        print(f"❌ Importación interrumpida en fila {interrumpido['fila']}: {interrumpido['error']}")
+    print(json.dumps({k: v for k, v in reporte.items() if k != "errores"}, ensure_ascii=False))
+    sys.exit(1 if reporte["fallidos"] or reporte["interrumpido"] else 0)
@@ -0,0 +1,15 @@
+import os
+
+from modelo.cargador import precargar_modelo
+
+
+def post_fork(server, worker):
+    """
+    Precargar el modelo de IA en cada worker, después del fork
+
+    Así el modelo y los hilos de PyTorch se crean en el worker y no en el master,
+    aunque se use --preload
+    """
+    # Repartir los núcleos según los workers configurados en gunicorn
+    os.environ.setdefault('WEB_CONCURRENCY', str(server.cfg.workers))
+    precargar_modelo()
@@ -0,0 +1,108 @@
+"""
+Benchmark de las variantes de inferencia del modelo en CPU
+
+Cada modo se mide en un proceso aparte para que el RSS reportado corresponda
+solo a esa variante:
+
+    python -m modelo.benchmark --modos fp32 int8 int8_estatico channels_last --iteraciones 50
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from modelo.cargador import MODOS
+
+
+def _rss_mb():
+    """
+    RSS actual del proceso en MB (Linux), o el pico si /proc no está disponible
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            paginas = int(statm.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_modo(modo, iteraciones, lote, calentamiento=3):
+    """
+    Cargar el modelo en el modo indicado y medir latencia, throughput y memoria
+    """
+    # Importar las librerías antes de medir para no contarlas como memoria del modelo
+    import timm
+    import torch
+    from modelo import cargador
+
+    rss_inicial = _rss_mb()
+    info = cargador.cargar_modelo(modo, calentamiento=0)
+    rss_cargado = _rss_mb()
+    tiempo_calentamiento = cargador.calentar(cargador.obtener_modelo(), modo, info['tamano_entrada'], calentamiento)
+    rss_calentado = _rss_mb()
+
+    entrada = torch.randn(lote, 3, info['tamano_entrada'], info['tamano_entrada'])
+    latencias = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        cargador.inferir(entrada)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    latencias.sort()
+    total_s = sum(latencias) / 1000
+    return {
+        'modo': modo,
+        'lote': lote,
+        'iteraciones': iteraciones,
+        'hilos': info['hilos'],
+        'latencia_p50_ms': round(statistics.median(latencias), 2),
+        'latencia_p95_ms': round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))], 2),
+        'throughput_img_s': round(iteraciones * lote / total_s, 2) if total_s else 0.0,
+        'rss_modelo_mb': round(rss_cargado - rss_inicial, 1),
+        'rss_calentamiento_mb': round(rss_calentado - rss_cargado, 1),
+        'rss_pico_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'tiempo_carga_s': info['tiempo_carga_s'],
+        'tiempo_calentamiento_s': round(tiempo_calentamiento, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de variantes de inferencia en CPU")
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    parser.add_argument('--iteraciones', type=int, default=50)
+    parser.add_argument('--lote', type=int, default=1)
+    parser.add_argument('--calentamiento', type=int, default=3)
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        # Proceso hijo: medir un solo modo e imprimir el resultado en JSON
+        print(json.dumps(medir_modo(args.modos[0], args.iteraciones, args.lote, args.calentamiento)))
+        return
+
+    resultados = []
+    for modo in args.modos:
+        salida = subprocess.run(
+            [sys.executable, '-m', 'modelo.benchmark', '--interno', '--modos', modo,
+             '--iteraciones', str(args.iteraciones), '--lote', str(args.lote),
+             '--calentamiento', str(args.calentamiento)],
+            capture_output=True, text=True
+        )
+        if salida.returncode != 0:
+            print(f"❌ Error midiendo modo {modo}:\n{salida.stderr}")
+            continue
+        resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    columnas = ['modo', 'hilos', 'latencia_p50_ms', 'latencia_p95_ms', 'throughput_img_s',
+                'rss_modelo_mb', 'rss_calentamiento_mb', 'rss_pico_mb', 'tiempo_carga_s', 'tiempo_calentamiento_s']
+    print(' | '.join(columnas))
+    for resultado in resultados:
+        print(' | '.join(str(resultado[c]) for c in columnas))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+load_dotenv()
+
+MODOS = ('fp32', 'int8', 'int8_estatico', 'channels_last')
+
+# Por debajo de esta fracción de parámetros en capas Linear, int8 dinámico apenas reduce memoria
+MIN_FRACCION_LINEAL = 0.5
+
+# Modelo cargado en este proceso (uno por worker de gunicorn): tupla (modelo, info)
+# publicada de una sola vez para que los lectores sin lock nunca vean un estado a medias
+_cargado = None
+# Evita cargas simultáneas con workers de varios hilos (gthread)
+_lock_carga = threading.RLock()
+
+
+def _config():
+    """
+    Leer la configuración del modelo desde variables de entorno
+    """
+    return {
+        'nombre': str(os.getenv('MODELO_NOMBRE', 'resnet18')).strip(),
+        'pesos': str(os.getenv('MODELO_PESOS', '')).strip(),
+        'num_clases': int(os.getenv('MODELO_NUM_CLASES', 2)),
+        'tamano': int(os.getenv('MODELO_TAMANO_ENTRADA', 224)),
+        'modo': str(os.getenv('MODELO_MODO', 'fp32')).strip().lower(),
+        'hilos': int(os.getenv('MODELO_HILOS', 0)),
+        'hilos_interop': int(os.getenv('MODELO_HILOS_INTEROP', 1)),
+        'workers': int(os.getenv('WEB_CONCURRENCY', 1)),
+        'calentamiento': int(os.getenv('MODELO_CALENTAMIENTO', 3)),
+        'calibracion': str(os.getenv('MODELO_CALIBRACION', '')).strip(),
+        'muestras_calibracion': int(os.getenv('MODELO_MUESTRAS_CALIBRACION', 32)),
+    }
+
+
+def cpus_disponibles():
+    """
+    Núcleos que este proceso puede usar realmente: respeta la afinidad de CPU y
+    el límite de CPU del contenedor (cgroup v2), no solo los núcleos del host
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            cuota, periodo = cpu_max.read().split()
+        if cuota != 'max':
+            cpus = min(cpus, max(1, int(cuota) // int(periodo)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def calcular_hilos(hilos=0, workers=1):
+    """
+    Hilos intra-op por worker: si no se fijan explícitamente, se reparten los
+    núcleos disponibles entre los workers para no sobresuscribir la CPU
+    """
+    if hilos > 0:
+        return hilos
+    return max(1, cpus_disponibles() // max(1, workers))
+
+
+def configurar_hilos(hilos=0, hilos_interop=1, workers=1):
+    """
+    Configurar los hilos de PyTorch antes de cargar el modelo
+
+    Returns:
+        tuple: (hilos intra-op, hilos inter-op) efectivos
+    """
+    import torch
+
+    intra = calcular_hilos(hilos, workers)
+    torch.set_num_threads(intra)
+    try:
+        # Solo se puede fijar una vez y antes de cualquier trabajo en paralelo
+        torch.set_num_interop_threads(max(1, hilos_interop))
+    except RuntimeError as e:
+        print(f"⚠️  No se pudieron fijar los hilos inter-op: {e}")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def _crear_modelo(config):
+    """
+    Crear el modelo timm en fp32 y cargar los pesos si se indicaron
+    """
+    import timm
+    import torch
+
+    red = timm.create_model(config['nombre'], pretrained=False, num_classes=config['num_clases'])
+    if config['pesos']:
+        estado = torch.load(config['pesos'], map_location='cpu')
+        if isinstance(estado, dict) and 'state_dict' in estado:
+            estado = estado['state_dict']
+        red.load_state_dict(estado)
+    return red.eval()
+
+
+def _fraccion_lineal(red):
+    """
+    Fracción de los parámetros del modelo que están en capas Linear
+    """
+    import torch
+
+    total = sum(p.numel() for p in red.parameters())
+    lineales = sum(
+        p.numel()
+        for capa in red.modules() if isinstance(capa, torch.nn.Linear)
+        for p in capa.parameters()
+    )
+    return lineales / total if total else 0.0
+
+
+def _datos_calibracion(config):
+    """
+    Lotes NCHW para calibrar la cuantización estática: un tensor guardado con
+    torch.save en MODELO_CALIBRACION o, si no hay, datos aleatorios
+    """
+    import torch
+
+    if config['calibracion']:
+        muestras = torch.load(config['calibracion'], map_location='cpu')
+    else:
+        print("⚠️  MODELO_CALIBRACION no configurado: se calibra con datos aleatorios, "
+              "la precisión int8 puede degradarse. Use imágenes reales preprocesadas")
+        muestras = torch.randn(config['muestras_calibracion'], 3, config['tamano'], config['tamano'])
+    return muestras.split(8)
+
+
+def _cuantizar_estatico(red, config):
+    """
+    Cuantización estática post-entrenamiento (FX): convoluciones y capas lineales en int8
+    """
+    import torch
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    motor = 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'fbgemm'
+    torch.backends.quantized.engine = motor
+
+    ejemplo = (torch.randn(1, 3, config['tamano'], config['tamano']),)
+    try:
+        preparado = prepare_fx(red, get_default_qconfig_mapping(motor), ejemplo)
+    except Exception as e:
+        raise ValueError(
+            f"El modelo {config['nombre']} no se puede trazar con FX para int8_estatico ({e}). "
+            f"Use el modo int8 o channels_last"
+        )
+    with torch.no_grad():
+        for lote in _datos_calibracion(config):
+            preparado(lote)
+    return convert_fx(preparado)
+
+
+def _aplicar_modo(red, modo, config):
+    """
+    Convertir el modelo fp32 a la variante de inferencia pedida
+    """
+    import torch
+
+    tamano = config['tamano']
+    if modo == 'fp32':
+        return red
+    if modo == 'int8':
+        # Cuantización dinámica: solo los pesos de las capas Linear pasan a int8
+        fraccion = _fraccion_lineal(red)
+        if fraccion < MIN_FRACCION_LINEAL:
+            print(f"⚠️  int8 dinámico solo cuantiza capas Linear ({fraccion:.0%} de los parámetros "
+                  f"de {config['nombre']}): casi no reduce memoria ni latencia. "
+                  f"Para CNN use int8_estatico")
+        return torch.ao.quantization.quantize_dynamic(red, {torch.nn.Linear}, dtype=torch.qint8)
+    if modo == 'int8_estatico':
+        return _cuantizar_estatico(red, config)
+    if modo == 'channels_last':
+        red = red.to(memory_format=torch.channels_last)
+        ejemplo = torch.randn(1, 3, tamano, tamano).to(memory_format=torch.channels_last)
+        # no_grad y no inference_mode: el grafo congelado no debe contener
+        # tensores de inferencia para poder usarse fuera de inference_mode
+        with torch.no_grad():
+            trazado = torch.jit.trace(red, ejemplo)
+        return torch.jit.freeze(trazado)
+    raise ValueError(f"Modo de inferencia no soportado: {modo}. Use {', '.join(MODOS)}")
+
+
+def preparar_entrada(tensor, info):
+    """
+    Adaptar un tensor NCHW al formato de memoria que espera la variante cargada
+    """
+    import torch
+
+    if info['modo'] == 'channels_last':
+        return tensor.contiguous(memory_format=torch.channels_last)
+    return tensor
+
+
+def inferir(tensor):
+    """
+    Ejecutar el modelo sobre un lote NCHW; carga el modelo si aún no está cargado
+    """
+    import torch
+
+    # Modelo e info del mismo snapshot, aunque otro hilo recargue la variante
+    red, info = _obtener_cargado()
+    with torch.inference_mode():
+        return red(preparar_entrada(tensor, info))
+
+
+def calentar(red, modo, tamano, iteraciones=3):
+    """
+    Pasadas de calentamiento para que la primera petición no pague el coste de
+    JIT y reserva de memoria
+    """
+    import torch
+
+    if iteraciones <= 0:
+        return 0.0
+    entrada = torch.randn(1, 3, tamano, tamano)
+    if modo == 'channels_last':
+        entrada = entrada.contiguous(memory_format=torch.channels_last)
+    inicio = time.perf_counter()
+    with torch.inference_mode():
+        for _ in range(iteraciones):
+            red(entrada)
+    return time.perf_counter() - inicio
+
+
+def cargar_modelo(modo=None, calentamiento=None):
+    """
+    Cargar el modelo en la variante indicada (o MODELO_MODO), configurar hilos y
+    calentarlo. Reemplaza al modelo cargado previamente en este proceso.
+
+    Args:
+        modo (str): Variante de inferencia; por defecto MODELO_MODO
+        calentamiento (int): Pasadas de calentamiento; por defecto MODELO_CALENTAMIENTO
+
+    Returns:
+        dict: Información de la variante cargada
+    """
+    with _lock_carga:
+        return _cargar_modelo(modo, calentamiento)
+
+
+def _cargar_modelo(modo, calentamiento):
+    global _cargado
+
+    config = _config()
+    modo = (modo or config['modo']).lower()
+    if modo not in MODOS:
+        raise ValueError(f"Modo de inferencia no soportado: {modo}. Use {', '.join(MODOS)}")
+    if calentamiento is None:
+        calentamiento = config['calentamiento']
+
+    print(f"🧠 Cargando modelo {config['nombre']} en modo {modo}...")
+    inicio = time.perf_counter()
+
+    hilos, hilos_interop = configurar_hilos(config['hilos'], config['hilos_interop'], config['workers'])
+    red = _aplicar_modo(_crear_modelo(config), modo, config)
+    tiempo_calentamiento = calentar(red, modo, config['tamano'], calentamiento)
+
+    info = {
+        'nombre': config['nombre'],
+        'modo': modo,
+        'hilos': hilos,
+        'hilos_interop': hilos_interop,
+        'workers': config['workers'],
+        'tamano_entrada': config['tamano'],
+        'tiempo_carga_s': round(time.perf_counter() - inicio, 3),
+        'tiempo_calentamiento_s': round(tiempo_calentamiento, 3),
+    }
+    _cargado = (red, info)
+    print(f"✅ Modelo cargado: {info}")
+    return info
+
+
+def _obtener_cargado():
+    cargado = _cargado
+    if cargado is None:
+        with _lock_carga:
+            # Otro hilo pudo cargarlo mientras se esperaba el lock
+            if _cargado is None:
+                cargar_modelo()
+            cargado = _cargado
+    return cargado
+
+
+def obtener_modelo():
+    """
+    Obtener el modelo cargado, cargándolo bajo demanda si hace falta
+    """
+    return _obtener_cargado()[0]
+
+
+def precargar_modelo():
+    """
+    Cargar y calentar el modelo al iniciar el proceso si MODELO_PRECARGAR=true
+
+    Debe llamarse en cada worker después del fork (hook post_fork de gunicorn),
+    nunca en el proceso master: los hilos de PyTorch/OpenMP no sobreviven al fork
+    """
+    if os.getenv('MODELO_PRECARGAR', 'False').lower() != 'true':
+        return
+    try:
+        cargar_modelo()
+    except Exception as e:
+        print(f"❌ Error cargando modelo de IA: {e}")
+
+
+def estado_modelo():
+    """
+    Estado del modelo para el health check
+    """
+    cargado = _cargado
+    if cargado is None:
+        return {"status": "not_loaded"}
+    return {"status": "loaded", **cargado[1]}